@@ -9,6 +9,7 @@ import time
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from kymion.core import get_progress_reporter
+from kymion.handlers.pipe import PipeQueue
 from kymion.handlers.queue import QueueHandler, QueueListener
 from kymion.handlers.rich import RichHandler
 
@@ -29,13 +30,14 @@ if __name__ == "__main__":
     get_progress_reporter().add_handler(RichHandler())
 
     mp_context = multiprocessing.get_context("spawn")
-    event_queue = mp_context.Queue()
+    event_queue = PipeQueue(ctx=mp_context)
 
-    with ProcessPoolExecutor(
+    # (The listener is shut down last, so that it receives all events sent by the workers.)
+    with QueueListener(event_queue), ProcessPoolExecutor(
         mp_context=mp_context,
         initializer=executor_initializer,
         initargs=(event_queue,),
-    ) as executor, QueueListener(event_queue):
+    ) as executor:
         futures = [executor.submit(task, i) for i in range(10)]
         for fut in as_completed(futures):
             print(f"Task {fut.result()} completed.")
@@ -1,7 +1,19 @@
-from setuptools import find_packages, setup
+from setuptools import Extension, find_packages, setup
 
 import versioneer
 
+# The compiled Task implementation is optional:
+# Without Cython or a compiler, the pure-Python implementation is used.
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    ext_modules = []
+else:
+    ext_modules = cythonize(
+        [Extension("kymion._fastcore", ["src/kymion/_fastcore.pyx"], optional=True)],
+        language_level=3,
+    )
+
 with open("Readme.md", "r") as fp:
     LONG_DESCRIPTION = fp.read()
 
@@ -18,7 +30,8 @@ setup(
     packages=find_packages("src"),
     package_dir={"": "src"},
     include_package_data=True,
-    install_requires=["attrs", "prefixed"],
+    ext_modules=ext_modules,
+    install_requires=[],
     python_requires=">=3.9",
     extras_require={
         "tests": [
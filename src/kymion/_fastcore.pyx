@@ -0,0 +1,156 @@
+# cython: language_level=3
+"""
+Compiled implementation of `kymion.core.Task`.
+
+This extension is optional. `kymion.core` falls back to its pure-Python `Task`
+if it is not available. The behavior of both implementations is identical,
+except that progress values are always floats.
+"""
+
+import time
+
+from . import core as _core
+
+cdef Py_ssize_t _MAX_TICK_BUDGET = _core._MAX_TICK_BUDGET
+
+# Create events without calling the (Python-level) NamedTuple constructor
+cdef object _tuple_new = tuple.__new__
+
+
+cdef class Task:
+    cdef public object progress_reporter
+    cdef public object iterable
+    cdef public object description
+    cdef public object total
+    cdef public double progress
+    cdef public double min_diff_n
+    cdef public double min_diff_t
+    cdef public long long id
+    cdef public double last_notify_t
+    cdef public double last_notify_n
+    cdef public bint finished
+    cdef public Py_ssize_t _tick_budget
+    cdef public Py_ssize_t _tick_counter
+
+    def __init__(
+        self,
+        progress_reporter,
+        iterable,
+        description,
+        total,
+        double initial,
+        double min_diff_n,
+        double min_diff_t,
+    ):
+        cdef double t
+
+        self.progress_reporter = progress_reporter
+
+        self.iterable = iterable
+
+        self.description = description
+
+        if total is None and iterable is not None:
+            try:
+                total = len(iterable)
+            except (TypeError, AttributeError):
+                total = None
+        if total == float("inf"):
+            total = None
+
+        self.total = total
+
+        self.progress = initial
+
+        self.min_diff_n = min_diff_n
+        self.min_diff_t = min_diff_t
+
+        self.id = (_core._pid << 32) | next(_core._task_counter)
+        self.last_notify_t = t = time.monotonic()
+        self.last_notify_n = initial
+        self.finished = False
+
+        # Number of updates between two clock reads (adapted to min_diff_t)
+        self._tick_budget = 1
+        self._tick_counter = 0
+
+        # Notify handlers of the existence of this task
+        self._notify(t)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.finish()
+
+    cpdef _notify(self, double t):
+        self.last_notify_n = self.progress
+        self.last_notify_t = t
+
+        # Skip creating the event if nobody is listening
+        if not self.progress_reporter._get_handler_chain():
+            return
+
+        self.progress_reporter.handle_event(
+            _tuple_new(
+                _core.Event,
+                (
+                    self.progress_reporter.name,
+                    self.id,
+                    t,
+                    self.progress,
+                    self.total,
+                    self.description,
+                    self.finished,
+                ),
+            )
+        )
+
+    cpdef update(self, double amount=1):
+        """
+        Increase progress by amount.
+
+        To keep the overhead in tight loops low, the clock is only read every
+        `_tick_budget` calls. The budget doubles while reads happen before `min_diff_t`
+        has passed. When a notification is overdue, the budget is scaled down to the
+        observed rate, so that the following notifications are on time again.
+        (After a sudden slowdown, the first notification can still be delayed by up to
+        `_tick_budget` calls.)
+        """
+        cdef double t, elapsed
+
+        self.progress += amount
+
+        self._tick_counter += 1
+        if self._tick_counter < self._tick_budget:
+            return
+        self._tick_counter = 0
+
+        if self.progress - self.last_notify_n < self.min_diff_n:
+            return
+
+        t = time.monotonic()
+        elapsed = t - self.last_notify_t
+        if elapsed >= self.min_diff_t:
+            if elapsed > 2 * self.min_diff_t and self._tick_budget > 1:
+                # Overshoot: Read the clock as often as the observed rate requires
+                self._tick_budget = max(
+                    1, <Py_ssize_t>(self._tick_budget * self.min_diff_t / elapsed)
+                )
+            self._notify(t)
+        elif self._tick_budget < _MAX_TICK_BUDGET:
+            # Too early: Read the clock less often
+            self._tick_budget <<= 1
+
+    cpdef finish(self):
+        self.finished = True
+        self._notify(time.monotonic())
+
+    def __iter__(self):
+        try:
+            for item in self.iterable:
+                yield item
+                self.update(1)
+
+        finally:
+            self.finish()
@@ -1,18 +1,115 @@
+import itertools
+import os
+import sys
 import threading
 import time
-import uuid
-from typing import Dict, Iterable, List, Optional
-import attrs
+import weakref
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
+#: Upper bound for the number of `Task.update` calls between two clock reads
+_MAX_TICK_BUDGET = 1 << 10
 
-@attrs.define
-class Event:
+# Task ids are unique across processes: The upper bits hold the process id,
+# the lower bits a process-local counter.
+_task_counter = itertools.count(1)
+_pid = os.getpid()
+
+
+def _reset_task_ids():
+    global _task_counter, _pid
+    _task_counter = itertools.count(1)
+    _pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_task_ids)
+
+# Callbacks (bound methods, referenced weakly) to run when the interpreter shuts down
+_exit_callbacks: "Dict[weakref.WeakMethod, None]" = {}
+
+# Whether _run_exit_callbacks is registered as a multiprocessing finalizer
+_mp_finalizer_registered = False
+
+
+def _run_exit_callbacks():
+    """
+    Run the registered exit callbacks (in reverse order of registration).
+    """
+
+    refs = list(_exit_callbacks)
+    _exit_callbacks.clear()
+
+    for ref in reversed(refs):
+        callback = ref()
+        if callback is not None:
+            callback()
+
+
+def _register_exit_callback(callback: Callable[[], None]):
+    """
+    Call the bound method `callback` when the interpreter shuts down.
+
+    The callback runs before non-daemon threads are joined and, in child processes of
+    multiprocessing, before multiprocessing closes its queues. Only a weak reference to
+    the object of `callback` is kept, so registering does not keep it alive.
+    """
+
+    global _mp_finalizer_registered
+
+    # In child processes, multiprocessing finalizes its queues before threading's exit
+    # hooks run. (Only if multiprocessing is in use, to avoid importing it.)
+    mp_util = sys.modules.get("multiprocessing.util")
+    if mp_util is not None and not _mp_finalizer_registered:
+        mp_util.Finalize(None, _run_exit_callbacks, exitpriority=20)
+        _mp_finalizer_registered = True
+
+    _exit_callbacks[weakref.WeakMethod(callback, _discard_exit_callback)] = None
+
+
+def _discard_exit_callback(ref: weakref.WeakMethod):
+    _exit_callbacks.pop(ref, None)
+
+
+def _unregister_exit_callback(callback: Callable[[], None]):
+    """
+    Remove a callback registered with `_register_exit_callback`.
+    """
+
+    _exit_callbacks.pop(weakref.WeakMethod(callback), None)
+
+
+def _reset_exit_callbacks():
+    global _mp_finalizer_registered
+
+    # Objects inherited from the parent are not shut down by the child
+    _exit_callbacks.clear()
+    _mp_finalizer_registered = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_exit_callbacks)
+
+# threading._register_atexit hooks run before non-daemon threads are joined
+threading._register_atexit(_run_exit_callbacks)  # type: ignore
+
+
+class Event(NamedTuple):
     name: str
     """The name of the ProgressReporter that emitted the event."""
     task_id: int
     """The unique identifier of the task."""
     time: float
-    """The time at which the event occurred."""
+    """The time at which the event occurred (as returned by `time.monotonic`)."""
     progress: float
     """The current progress of the task (in task units)."""
     total: Optional[float]
@@ -23,7 +120,20 @@ class Event:
     """Whether the task has finished."""
 
 
+#: Incremented whenever a handler is added anywhere, invalidating all handler chains
+_handlers_generation = 0
+
+
 class ProgressReporter:
+    __slots__ = (
+        "name",
+        "parent",
+        "handlers",
+        "_handler_ids",
+        "_handler_chain",
+        "_handler_chain_generation",
+    )
+
     root: "ProgressReporter"
     manager: "ProgressReporterManager"
 
@@ -32,18 +142,51 @@ class ProgressReporter:
         self.parent = parent
         self.handlers: "List[ProgressHandler]" = []
 
+        # Identities of the registered handlers (for fast membership tests)
+        self._handler_ids: Set[int] = set()
+
+        # Flattened handlers of this reporter and all its ancestors (built lazily)
+        self._handler_chain: "Tuple[ProgressHandler, ...]" = ()
+        self._handler_chain_generation = -1
+
     def add_handler(self, handler: "ProgressHandler"):
-        if not handler in self.handlers:
-            self.handlers.append(handler)
+        global _handlers_generation
 
-    def handle_event(self, event: Event):
+        handler_id = id(handler)
+        if handler_id in self._handler_ids:
+            return
+
+        self._handler_ids.add(handler_id)
+        self.handlers.append(handler)
+        _handlers_generation += 1
+
+    def _get_handler_chain(self) -> "Tuple[ProgressHandler, ...]":
+        """
+        Return the handlers of this reporter and all its ancestors, rebuilding them if
+        any handler was added since they were last collected.
+        """
+
+        generation = _handlers_generation
+        if self._handler_chain_generation == generation:
+            return self._handler_chain
+
+        handlers: "List[ProgressHandler]" = []
         pr = self
         while pr is not None:
-            for handler in pr.handlers:
-                handler.handle_event(event)
-
+            handlers.extend(pr.handlers)
             pr = pr.parent
 
+        # Only mark the chain as current once it is in place, so that concurrent callers
+        # never pick up an outdated chain
+        self._handler_chain = handler_chain = tuple(handlers)
+        self._handler_chain_generation = generation
+
+        return handler_chain
+
+    def handle_event(self, event: Event):
+        for handler in self._get_handler_chain():
+            handler.handle_event(event)
+
     def task(
         self,
         iterable: Optional[Iterable] = None,
@@ -56,8 +199,44 @@ class ProgressReporter:
     ) -> "Task":
         return Task(self, iterable, description, total, initial, min_diff_n, min_diff_t)
 
+    def map_progress(
+        self,
+        fn: Callable,
+        iterable: Iterable,
+        *,
+        description: Optional[str] = None,
+        total: Optional[float] = None,
+        min_diff_t: float = 0.1,  # 100ms
+    ) -> Iterator:
+        """
+        Apply `fn` to every item of `iterable` (like `map`) while reporting progress.
+        """
+
+        return map(
+            fn,
+            self.task(
+                iterable, description=description, total=total, min_diff_t=min_diff_t
+            ),
+        )
+
 
 class Task:
+    __slots__ = (
+        "progress_reporter",
+        "iterable",
+        "description",
+        "total",
+        "progress",
+        "min_diff_n",
+        "min_diff_t",
+        "id",
+        "last_notify_t",
+        "last_notify_n",
+        "finished",
+        "_tick_budget",
+        "_tick_counter",
+    )
+
     def __init__(
         self,
         progress_reporter: ProgressReporter,
@@ -89,11 +268,15 @@ class Task:
         self.min_diff_n = min_diff_n
         self.min_diff_t = min_diff_t
 
-        self.id = uuid.uuid4().int
-        self.last_notify_t = t = time.time()
+        self.id = (_pid << 32) | next(_task_counter)
+        self.last_notify_t = t = time.monotonic()
         self.last_notify_n = initial
         self.finished = False
 
+        # Number of updates between two clock reads (adapted to min_diff_t)
+        self._tick_budget = 1
+        self._tick_counter = 0
+
         # Notify handlers of the existence of this task
         self._notify(t)
 
@@ -107,6 +290,10 @@ class Task:
         self.last_notify_n = self.progress
         self.last_notify_t = t
 
+        # Skip creating the event if nobody is listening
+        if not self.progress_reporter._get_handler_chain():
+            return
+
         self.progress_reporter.handle_event(
             Event(
                 self.progress_reporter.name,
@@ -120,19 +307,50 @@ class Task:
         )
 
     def update(self, amount: float = 1):
-        """Increase progress by amount"""
+        """
+        Increase progress by amount.
+
+        To keep the overhead in tight loops low, the clock is only read every
+        `_tick_budget` calls. The budget doubles while reads happen before `min_diff_t`
+        has passed. When a notification is overdue, the budget is scaled down to the
+        observed rate, so that the following notifications are on time again.
+        (After a sudden slowdown, the first notification can still be delayed by up to
+        `_tick_budget` calls.)
+        """
         self.progress += amount
 
-        if self.progress - self.last_notify_n >= self.min_diff_n:
-            t = time.time()
-            if t - self.last_notify_t >= self.min_diff_t:
-                self._notify(t)
+        self._tick_counter += 1
+        if self._tick_counter < self._tick_budget:
+            return
+        self._tick_counter = 0
+
+        if self.progress - self.last_notify_n < self.min_diff_n:
+            return
+
+        t = time.monotonic()
+        elapsed = t - self.last_notify_t
+        if elapsed >= self.min_diff_t:
+            if elapsed > 2 * self.min_diff_t and self._tick_budget > 1:
+                # Overshoot: Read the clock as often as the observed rate requires
+                self._tick_budget = max(
+                    1, int(self._tick_budget * self.min_diff_t / elapsed)
+                )
+            self._notify(t)
+        elif self._tick_budget < _MAX_TICK_BUDGET:
+            # Too early: Read the clock less often
+            self._tick_budget <<= 1
 
     def finish(self):
         self.finished = True
-        self._notify(time.time())
+        self._notify(time.monotonic())
+
+    def __iter__(self) -> Iterator:
+        if self.min_diff_n == 0 and self.min_diff_t > 0:
+            return self._iter_throttled()
+
+        return self._iter()
 
-    def __iter__(self):
+    def _iter(self):
         try:
             for item in self.iterable:  # type: ignore
                 yield item
@@ -141,6 +359,51 @@ class Task:
         finally:
             self.finish()
 
+    def _iter_throttled(self):
+        """
+        Iterate with `update` inlined and its state kept in local variables.
+
+        Only valid for `min_diff_n == 0`. Mirrors the throttling logic of `update`.
+        """
+
+        monotonic = time.monotonic
+        notify = self._notify
+        min_diff_t = self.min_diff_t
+        tick_budget = self._tick_budget
+        tick_counter = self._tick_counter
+
+        try:
+            for item in self.iterable:  # type: ignore
+                yield item
+
+                self.progress += 1
+
+                tick_counter += 1
+                if tick_counter < tick_budget:
+                    continue
+                tick_counter = 0
+
+                t = monotonic()
+                elapsed = t - self.last_notify_t
+                if elapsed >= min_diff_t:
+                    if elapsed > 2 * min_diff_t and tick_budget > 1:
+                        tick_budget = max(1, int(tick_budget * min_diff_t / elapsed))
+                    notify(t)
+                elif tick_budget < _MAX_TICK_BUDGET:
+                    tick_budget <<= 1
+
+        finally:
+            self._tick_budget = tick_budget
+            self._tick_counter = tick_counter
+            self.finish()
+
+
+# Use the compiled implementation of Task if available
+try:
+    from ._fastcore import Task  # type: ignore # noqa: F811
+except ImportError:
+    pass
+
 
 class ProgressHandler:
     def handle_event(self, event: Event): ...
@@ -172,15 +435,15 @@ class ProgressReporterManager:
         if name is None:
             return self.root
 
-        try:
-            return self.progress_reporters[name]
-        except KeyError:
-            pass
+        pr = self.progress_reporters.get(name)
+        if pr is not None:
+            return pr
 
         # TODO: Instead of root, we have to find the correct parent!
-        pr = self.progress_reporters[name] = ProgressReporter(name, self.root)
-
-        return pr
+        # (setdefault is atomic, so concurrent callers receive the same instance.)
+        return self.progress_reporters.setdefault(
+            name, ProgressReporter(name, self.root)
+        )
 
 
 ProgressReporter.root = root = ProgressReporter("root", None)
@@ -191,6 +454,148 @@ del root
 del manager
 
 
+class EventBuffer:
+    """
+    A buffer that keeps the most recent event of each task and passes the pending events
+    to a callback from a separate thread.
+
+    Once events are pending, the thread waits for `interval` seconds (or until
+    `max_pending` tasks have pending events) and passes them to `flush`.
+    Calls of `flush` are serialized.
+
+    Only a weak reference to the object of `flush` is kept, so that the buffer does not
+    keep its owner alive. The thread terminates once the owner is garbage-collected
+    (dropping the pending events), `close` is called or the interpreter shuts down.
+    Events that are added after closing are passed to `flush` immediately.
+
+    Args:
+        flush (Callable[[List[Event]], None]): A bound method that receives the pending events.
+        interval (float, optional): The time (in seconds) to wait for more events before
+            passing them on. Defaults to 0.
+        max_pending (int, optional): The number of tasks with pending events after which
+            the events are passed on before `interval` has passed. Defaults to no limit.
+        daemon (bool, optional): Whether the thread is a daemon thread. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Event]], None],
+        interval: float = 0,
+        max_pending: Optional[int] = None,
+        daemon: bool = True,
+    ) -> None:
+        self.interval = interval
+        self.max_pending = max_pending
+
+        # Close the buffer once the object of the callback is garbage-collected
+        self._flush_ref = weakref.WeakMethod(flush, self._owner_collected)
+
+        # Condition for synchronizing the pending events
+        self._condition = threading.Condition()
+
+        # Dictionary to store the most recent events for each task (keyed by task id)
+        self._pending: Dict[int, Event] = {}
+
+        # Serializes calls of the callback so that events are passed on in order
+        self._flush_lock = threading.RLock()
+
+        # Set once the buffer is closed
+        self._closed = False
+
+        # Thread that passes on the pending events
+        self._thread = threading.Thread(target=self._run, daemon=daemon)
+        self._thread.start()
+
+        # Pass on the remaining events when the interpreter shuts down
+        _register_exit_callback(self.close)
+
+    def _owner_collected(self, ref: weakref.WeakMethod):
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def _flush_early(self) -> bool:
+        return self._closed or (
+            self.max_pending is not None and len(self._pending) >= self.max_pending
+        )
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+
+                if self.interval > 0:
+                    # Let more events accumulate
+                    self._condition.wait_for(self._flush_early, self.interval)
+
+                closed = self._closed
+
+            self.flush()
+
+            if closed:
+                return
+
+    def add(self, event: Event):
+        """
+        Add an event, replacing a pending event of the same task.
+        """
+
+        with self._condition:
+            pending = self._pending
+            pending[event.task_id] = event
+
+            if not self._closed:
+                # Wake up the thread if it is waiting for the first event
+                # or if enough events are pending
+                if len(pending) == 1 or self._flush_early():
+                    self._condition.notify()
+                return
+
+        self.flush()
+
+    def discard(self, task_id: int):
+        """
+        Remove the pending event of a task.
+        """
+
+        with self._condition:
+            self._pending.pop(task_id, None)
+
+    def flush(self):
+        """
+        Pass all pending events to the callback.
+        """
+
+        with self._flush_lock:
+            with self._condition:
+                if not self._pending:
+                    return
+                events, self._pending = list(self._pending.values()), {}
+
+            flush = self._flush_ref()
+            if flush is not None:
+                flush(events)
+
+    def close(self):
+        """
+        Pass on the remaining events and stop the thread.
+
+        Waits for the thread to terminate (unless called from the callback).
+        """
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+        self.flush()
+
+        _unregister_exit_callback(self.close)
+
+
 class NonBlockingRelay(ProgressHandler):
     """
     NonBlockingRelay is a ProgressHandler that forwards progress events to multiple handlers
@@ -206,45 +611,24 @@ class NonBlockingRelay(ProgressHandler):
         # List of handlers to forward events to
         self.handlers: List[ProgressHandler] = []
 
-        # Condition for synchronizing the event store
-        self._condition = threading.Condition()
+        # Identities of the registered handlers (for fast membership tests)
+        self._handler_ids: Set[int] = set()
 
-        # Dictionary to store the most recent events for each task (keyed by task id)
-        self._events = {}
+        # Buffer that forwards the most recent event of each task from a separate thread
+        self._buffer = EventBuffer(self._forward, daemon=daemon)
 
-        # Thread that processes the events
-        self._worker_thread = threading.Thread(
-            target=self._process_events, daemon=daemon
-        )
-        self._worker_thread.start()
-
-    def _process_events(self):
+    def close(self):
         """
-        The worker thread function that continuously processes events. It retrieves the most
-        recent event for each task and forwards it to the registered handlers.
+        Forward the remaining events and stop the worker thread.
 
-        The thread waits on a condition to avoid busy waiting when there are no new events.
+        Events that arrive after closing are forwarded immediately.
         """
 
-        while True:
-            with self._condition:
-                # Wait until a new event is available or the main thread terminates
-                while True:
-                    if not threading.main_thread().is_alive():
-                        return
-
-                    try:
-                        # Pop one event from the _tasks dictionary
-                        _, event = self._events.popitem()
-                        # Exit the waiting loop to process the event
-                        break
-                    except KeyError:
-                        # If no tasks are currently available, wait until notified or timeout.
-                        # The timeout allows to detect the death of the main thread.
-                        self._condition.wait(0.1)
-                        continue
-
-            # Forward the event to all registered handlers
+        self._buffer.close()
+
+    def _forward(self, events: List[Event]):
+        # Forward the events to all registered handlers
+        for event in events:
             for handler in self.handlers:
                 handler.handle_event(event)
 
@@ -253,8 +637,12 @@ class NonBlockingRelay(ProgressHandler):
         Register a new handler to receive events forwarded by this relay.
         """
 
-        if not handler in self.handlers:
-            self.handlers.append(handler)
+        handler_id = id(handler)
+        if handler_id in self._handler_ids:
+            return
+
+        self._handler_ids.add(handler_id)
+        self.handlers.append(handler)
 
     def handle_event(self, event):
         """
@@ -265,6 +653,4 @@ class NonBlockingRelay(ProgressHandler):
             event (tuple): The event to be handled, which contains the task id and progress details.
         """
 
-        with self._condition:
-            self._events[event.task_id] = event
-            self._condition.notify()
+        self._buffer.add(event)
@@ -1,21 +1,60 @@
+import math
 import time
 from logging import INFO, Logger, getLogger
-from typing import Dict, List, Literal, Optional
-
-import prefixed
+from typing import Callable, Dict, List, Literal, Optional, Sequence, Tuple
 
 from ..core import Event, ProgressHandler, get_progress_reporter
 
 NumberFormat = Literal[None, "si", "iec"]
 
 
+def _make_prefixes(base: int, suffixes: Sequence[str], n_negative: int = 0):
+    """
+    Build a table of (cutoff, factor, suffix) for the given prefixes (in descending order).
+
+    The cutoff is lowered by half a unit of the second decimal, so that e.g. 999.999
+    is formatted as "1.00k" instead of "1000.00".
+    """
+
+    n_positive = len(suffixes) - n_negative - 1
+    return [
+        (0.995 * base**e, base**e, suffix)
+        for e, suffix in zip(range(n_positive, -n_negative - 1, -1), suffixes)
+    ]
+
+
+_SI_PREFIXES = _make_prefixes(
+    1000,
+    ["Q", "R", "Y", "Z", "E", "P", "T", "G", "M", "k", ""]
+    + ["m", "μ", "n", "p", "f", "a", "z", "y", "r", "q"],
+    n_negative=10,
+)
+
+_IEC_PREFIXES = _make_prefixes(
+    1024, ["Yi", "Zi", "Ei", "Pi", "Ti", "Gi", "Mi", "Ki", ""]
+)
+
+
+def _format_prefixed(x: float, prefixes: List[Tuple[float, float, str]]) -> str:
+    if not x or not math.isfinite(x):
+        return f"{x:.2f}"
+
+    # Use the first prefix with a cutoff below the absolute value (or the last prefix)
+    abs_x = abs(x)
+    for cutoff, factor, suffix in prefixes:
+        if abs_x >= cutoff:
+            break
+
+    return f"{x / factor:.2f}{suffix}"
+
+
 def format_number(x: float, format: NumberFormat):
     if format is None:
         return f"{x:.2f}"
     if format == "si":
-        return f"{prefixed.Float(x):.2h}"
+        return _format_prefixed(x, _SI_PREFIXES)
     if format == "iec":
-        return f"{prefixed.Float(x):.2k}"
+        return _format_prefixed(x, _IEC_PREFIXES)
 
     raise ValueError(f"Unsupported format: {format!r}")
 
@@ -54,6 +93,8 @@ class TaskLogger:
         smoothing_min_n_done (float, optional): The minimum number of processed items after
             which smoothing is applied. It might make sense to use a number >0 because the
             first few objects tend to be processed slower. Defaults to 0.
+        clock (Callable[[], float], optional): The function returning the current time
+            (in seconds). Defaults to `time.monotonic`.
     """
 
     def __init__(
@@ -68,6 +109,7 @@ class TaskLogger:
         number_format: NumberFormat = "si",
         smoothing: float = 0.5,
         smoothing_min_n_done: float = 0,
+        clock: Callable[[], float] = time.monotonic,
     ) -> None:
         self.logger = logger
         self.level = level
@@ -81,12 +123,14 @@ class TaskLogger:
         self.unit = unit
         self.number_format: NumberFormat = number_format
         self.smoothing = smoothing
+        self._one_minus_smoothing = 1.0 - smoothing
         self.smoothing_min_n_done = smoothing_min_n_done
+        self._clock = clock
 
         #: Total number of processed items
         self.n_done = 0
         #: Timestamp of the last update
-        self.t_last_update = time.time()
+        self.t_last_update = clock()
         #: Elapsed seconds since the first update
         self.elapsed_since_start = 0
         #: Timestamp of the last log
@@ -101,73 +145,82 @@ class TaskLogger:
         Updates the progress by setting the count of processed items to `n`.
         Logs the progress if the specified log interval has passed since the last log.
         """
-        t_cur = time.time()
+        t_cur = self._clock()
         delta_t = t_cur - self.t_last_update
         self.t_last_update = t_cur
 
-        self.elapsed_since_start += delta_t
+        elapsed_since_start = self.elapsed_since_start = (
+            self.elapsed_since_start + delta_t
+        )
         self.n_done = n
 
-        if self.t_last_log is None or (t_cur > self.t_last_log + self.log_interval):
-            if self.t_last_log is None:
-                # Global rate estimate (items/second)
-                rate = self.n_done / self.elapsed_since_start
-            else:
-                # Local rate estimate
-                elapsed_since_last_log = t_cur - self.t_last_log
-                n_done_since_last_log = self.n_done - self.n_done_last_log
-                rate = n_done_since_last_log / elapsed_since_last_log
-
-                # Apply smoothing if possible (items/second)
-                if (
-                    (self.rate_last_log is not None)
-                    and (self.smoothing > 0)
-                    and (self.n_done >= self.smoothing_min_n_done)
-                ):
-                    rate = (self.smoothing * self.rate_last_log) + (
-                        (1 - self.smoothing) * rate
-                    )
-
-            self.t_last_log = t_cur
-            self.n_done_last_log = self.n_done
-            self.rate_last_log = rate
-
-            if self.description is not None:
-                msg = f"{self.description}: "
-            else:
-                msg = ""
-
-            parts = []
-
-            if self.n_total is not None:
-                t_remaining = (self.n_total - self.n_done) / rate if rate else None
-
-                parts.append(
-                    f"{format_number(self.n_done, self.number_format)} / {format_number(self.n_total, self.number_format)}"
-                )
-                parts.append(f"{self.n_done / self.n_total:.2%}")
+        t_last_log = self.t_last_log
+        if t_last_log is not None and t_cur <= t_last_log + self.log_interval:
+            return
+
+        if t_last_log is None:
+            # Global rate estimate (items/second)
+            rate = n / elapsed_since_start if elapsed_since_start else 0.0
+        else:
+            # Local rate estimate
+            rate = (n - self.n_done_last_log) / (t_cur - t_last_log)
+
+            # Apply smoothing if possible (items/second)
+            rate_last_log = self.rate_last_log
+            smoothing = self.smoothing
+            if (
+                (rate_last_log is not None)
+                and (smoothing > 0)
+                and (n >= self.smoothing_min_n_done)
+            ):
+                rate = smoothing * rate_last_log + self._one_minus_smoothing * rate
+
+        self.t_last_log = t_cur
+        self.n_done_last_log = n
+        self.rate_last_log = rate
+
+        description = self.description
+        if description is not None:
+            msg = f"{description}: "
+        else:
+            msg = ""
+
+        n_total = self.n_total
+        number_format = self.number_format
+        unit = self.unit
+        parts = []
+
+        if n_total is not None:
+            t_remaining = (n_total - n) / rate if rate else None
+
+            parts.append(
+                f"{format_number(n, number_format)} / {format_number(n_total, number_format)}"
+            )
+            parts.append(f"{n / n_total:.2%}")
 
-                parts.append(
-                    f"{format_interval(self.elapsed_since_start)} + {format_interval(t_remaining)}"
-                )
-            else:
-                parts.append(f"{format_number(self.n_done, self.number_format)} / ?")
+            parts.append(
+                f"{format_interval(elapsed_since_start)} + {format_interval(t_remaining)}"
+            )
+        else:
+            parts.append(f"{format_number(n, number_format)} / ?")
 
-                parts.append(f"{format_interval(self.elapsed_since_start)}")
+            parts.append(f"{format_interval(elapsed_since_start)}")
 
-            if (rate >= 1) or (rate <= 0):
-                parts.append(f"{format_number(rate, self.number_format)}{self.unit}/s")
-            else:
-                parts.append(f"{1/rate:.2f}s/{self.unit}")
+        if (rate >= 1) or (rate <= 0):
+            parts.append(f"{format_number(rate, number_format)}{unit}/s")
+        else:
+            parts.append(f"{1/rate:.2f}s/{unit}")
 
-            msg += ", ".join(parts)
+        msg += ", ".join(parts)
 
-            self.logger.log(self.level, msg)
+        self.logger.log(self.level, msg)
 
 
 class LoggingHandler(ProgressHandler):
     """
     A ProgressHandler that reports progress as log messages.
+
+    Each task is logged by a separate TaskLogger. See there for a description of the arguments.
     """
 
     def __init__(
@@ -177,6 +230,7 @@ class LoggingHandler(ProgressHandler):
         unit="it",
         smoothing: float = 0.5,
         smoothing_min_n_done: float = 0,
+        clock: Callable[[], float] = time.monotonic,
     ) -> None:
         super().__init__()
 
@@ -185,25 +239,40 @@ class LoggingHandler(ProgressHandler):
         self.unit = unit
         self.smoothing = smoothing
         self.smoothing_min_n_done = smoothing_min_n_done
+        self.clock = clock
 
-        self.task_loggers: Dict[int, TaskLogger] = {}
+        # Update functions for each task (keyed by task id)
+        self._task_updaters: Dict[int, Callable[[Event], None]] = {}
 
-    def handle_event(self, event: Event):
-        try:
-            task_logger = self.task_loggers[event.task_id]
-        except KeyError:
-            self.task_loggers[event.task_id] = task_logger = TaskLogger(
-                getLogger(event.name),
-                level=self.level,
-                description=event.description,
-                n_total=event.total,
-                log_interval=self.log_interval,
-                unit=self.unit,
-                smoothing=self.smoothing,
-                smoothing_min_n_done=self.smoothing_min_n_done,
-            )
+    def _make_updater(self, event: Event) -> Callable[[Event], None]:
+        """
+        Create a TaskLogger for the task of `event` and return a function that updates it.
+        """
+
+        task_logger_update = TaskLogger(
+            getLogger(event.name),
+            level=self.level,
+            description=event.description,
+            n_total=event.total,
+            log_interval=self.log_interval,
+            unit=self.unit,
+            smoothing=self.smoothing,
+            smoothing_min_n_done=self.smoothing_min_n_done,
+            clock=self.clock,
+        ).update
+        task_updaters = self._task_updaters
 
-        task_logger.update(n=event.progress)
+        def update(event: Event):
+            task_logger_update(event.progress)
+
+            if event.finished:
+                del task_updaters[event.task_id]
+
+        return update
+
+    def handle_event(self, event: Event):
+        update = self._task_updaters.get(event.task_id)
+        if update is None:
+            update = self._task_updaters[event.task_id] = self._make_updater(event)
 
-        if event.finished:
-            del self.task_loggers[event.task_id]
+        update(event)
@@ -1,37 +1,118 @@
-import multiprocessing
-import queue
 import threading
+from typing import Any, Callable, Dict, List, Optional, Protocol, Union
 
-from ..core import ProgressHandler, Event, get_progress_reporter
+from ..core import (
+    Event,
+    EventBuffer,
+    ProgressHandler,
+    ProgressReporter,
+    _register_exit_callback,
+    _unregister_exit_callback,
+    get_progress_reporter,
+)
+
+
+class EventQueue(Protocol):
+    """
+    The interface required from queues used with QueueHandler and QueueListener.
+
+    This is satisfied by `multiprocessing.Queue`, `queue.Queue` and drop-in replacements
+    like `faster_fifo.Queue <https://github.com/alex-petrenko/faster-fifo>`_.
+    """
+
+    def put(self, obj: Any, block: bool = True, timeout: Optional[float] = None): ...
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any: ...
 
 
 class QueueHandler(ProgressHandler):
     """
-    A ProgressHandler that forwards progress events to a multiprocessing.Queue.
+    A ProgressHandler that forwards progress events to a queue.
+
+    Events are buffered (keeping only the most recent event for each task) and sent
+    as a list by a background thread every `flush_interval` seconds, or as soon as
+    `batch_size` tasks have pending events. Events of finished tasks are sent immediately.
 
     Args:
-        queue (multiprocessing.Queue): The queue to forward events to.
+        queue (EventQueue): The queue to forward events to.
+            Typically a `multiprocessing.Queue`. For high event rates across many processes,
+            `faster_fifo.Queue` is recommended, as it avoids most of the locking and
+            copying overhead of `multiprocessing.Queue`.
+        flush_interval (float, optional): The interval (in seconds) after which pending
+            events are sent. Defaults to 0.05.
+        msgpack (bool, optional): Encode batches as MessagePack using
+            `msgspec <https://jcristharif.com/msgspec/>`_ before putting them into the queue.
+            This is cheaper than pickling the events, but only works with queues
+            that accept arbitrary objects (e.g. not with `SharedMemoryQueue`).
+            QueueListener decodes such batches automatically. Defaults to False.
+        batch_size (int, optional): The number of tasks with pending events after which
+            the events are sent before `flush_interval` has passed. Defaults to 1024.
 
     Note:
         This is analogous to `logging.handlers.QueueHandler`.
     """
 
-    def __init__(self, queue: multiprocessing.Queue) -> None:
+    def __init__(
+        self,
+        queue: EventQueue,
+        flush_interval: float = 0.05,
+        msgpack: bool = False,
+        batch_size: int = 1024,
+    ) -> None:
         super().__init__()
 
         self.queue = queue
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._encode: Optional[Callable[[List[Event]], bytes]] = None
+        if msgpack:
+            import msgspec
+
+            self._encode = msgspec.msgpack.Encoder().encode
+
+        # Buffer that sends the most recent event of each task from a separate thread
+        self._buffer = EventBuffer(
+            self._send, interval=flush_interval, max_pending=batch_size
+        )
+
+    def close(self):
+        """
+        Send the pending events and stop the flush thread.
+
+        Events that arrive after closing are sent immediately.
+        """
+
+        self._buffer.close()
+
+    def flush(self):
+        """
+        Send all pending events.
+        """
+
+        self._buffer.flush()
+
+    def _send(self, events: List[Event]):
+        if self._encode is not None:
+            self.queue.put(self._encode(events))
+        else:
+            self.queue.put(events)
 
     def handle_event(self, event: Event):
-        self.queue.put(event)
+        self._buffer.add(event)
+
+        # Send finished events immediately
+        if event.finished:
+            self._buffer.flush()
 
 
 class QueueListener:
     """
-    A receiver that processes events from a multiprocessing.Queue and forwards them to
+    A receiver that processes events from a queue and forwards them to
     the specified ProgressReporter.
 
     Args:
-        queue (multiprocessing.Queue): The queue to read events from.
+        queue (EventQueue): The queue to read events from.
         daemon (bool): Whether the processing thread should be a daemon thread.
 
     Note:
@@ -41,7 +122,7 @@ class QueueListener:
 
     def __init__(
         self,
-        queue: multiprocessing.Queue,
+        queue: EventQueue,
     ) -> None:
         self.queue = queue
 
@@ -49,6 +130,9 @@ class QueueListener:
         self._worker_thread = threading.Thread(target=self._process_events, daemon=True)
         self._worker_thread.start()
 
+        # Stop the worker thread when the interpreter shuts down
+        _register_exit_callback(self._shutdown_at_exit)
+
     def __enter__(self):
         return self
 
@@ -58,32 +142,56 @@ class QueueListener:
     def shutdown(self, wait: bool = True):
         """
         Signal the receiver to shut down.
+
+        The stop signal is queued after all events that were already sent.
+        (If the queue is busy or full, this blocks until the signal could be queued.)
         """
 
-        self.queue.put(None, False)
+        _unregister_exit_callback(self._shutdown_at_exit)
+
+        self.queue.put(None)
 
         if wait:
             self._worker_thread.join()
 
+    def _shutdown_at_exit(self):
+        if self._worker_thread.is_alive():
+            self.shutdown(wait=False)
+
     def _process_events(self):
         """
-        Continuously process events from the queue and forwards them to the progress reporter.
+        Continuously process batches of events from the queue and forwards them to the progress reporter.
 
-        Stops processing if the main thread terminates or a `None` event is encountered.
+        Stops processing once a `None` batch is encountered, which is sent by `shutdown`
+        (or automatically when the interpreter shuts down).
         """
 
+        # Cache of progress reporters (keyed by name)
+        progress_reporters: Dict[str, ProgressReporter] = {}
+
+        # Decoder for MessagePack-encoded batches (created on first use)
+        decode: Optional[Callable[[bytes], List[Event]]] = None
+
         while True:
-            # Exit if the main thread terminates
-            if not threading.main_thread().is_alive():
+            events: Union[None, bytes, List[Event]] = self.queue.get()
+
+            if events is None:
                 return
 
-            try:
-                event: Event | None = self.queue.get(False, 0.1)
-            except queue.Empty:
-                continue
+            if isinstance(events, bytes):
+                if decode is None:
+                    import msgspec
 
-            if event is None:
-                return
+                    decode = msgspec.msgpack.Decoder(List[Event]).decode
+
+                events = decode(events)
+
+            # Forward the events to the correct progress reporter
+            for event in events:
+                progress_reporter = progress_reporters.get(event.name)
+                if progress_reporter is None:
+                    progress_reporter = progress_reporters[event.name] = (
+                        get_progress_reporter(event.name)
+                    )
 
-            # Forward the event to the correct progress reporter
-            get_progress_reporter(event.name).handle_event(event)
+                progress_reporter.handle_event(event)
@@ -1,43 +1,98 @@
-import threading
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 import rich.progress
 
-from ..core import ProgressHandler
+from ..core import (
+    Event,
+    EventBuffer,
+    ProgressHandler,
+    _register_exit_callback,
+    _unregister_exit_callback,
+)
 
 
 class RichHandler(ProgressHandler):
-    def __init__(self) -> None:
+    """
+    A ProgressHandler that displays progress bars using rich.
+
+    Events are collected (keeping only the most recent event for each task) and applied
+    to the display at most every `update_interval` seconds. Events of finished tasks
+    are applied immediately.
+
+    Args:
+        update_interval (float, optional): The minimum interval (in seconds) between two
+            updates of the display. Defaults to 0.05.
+    """
+
+    def __init__(self, update_interval: float = 0.05) -> None:
         super().__init__()
 
+        self.update_interval = update_interval
+
         self.progress = rich.progress.Progress()
         self.progress.start()
 
-        self.rich_task_ids: Dict[int, rich.progress.TaskID] = {}
+        # Rich task id, total and description of each task (keyed by task id)
+        self.rich_tasks: Dict[
+            int, Tuple[rich.progress.TaskID, Optional[float], Optional[str]]
+        ] = {}
 
-        # Stop the progress display gracefully once the main thread stops in order to leave the terminal tidy
-        threading.Thread(target=self._stop_progress).start()
+        # Buffer that applies the most recent event of each task from a separate thread
+        # (It also serializes the updates of the display.)
+        self._buffer = EventBuffer(self._apply, interval=update_interval)
 
-    def _stop_progress(self):
-        # Wait for main thread to finish
-        threading.main_thread().join()
-        # Then stop the progress widget
+        # Stop the progress display gracefully when the interpreter shuts down in order to leave the terminal tidy
+        _register_exit_callback(self.close)
+
+    def close(self):
+        """
+        Apply the remaining events and stop the progress display.
+        """
+
+        self._buffer.close()
         self.progress.stop()
 
-    def handle_event(self, event):
-        try:
-            rich_task_id = self.rich_task_ids[event.task_id]
-        except KeyError:
-            self.rich_task_ids[event.task_id] = rich_task_id = self.progress.add_task(
-                event.description or "", total=event.total
+        _unregister_exit_callback(self.close)
+
+    def _apply(self, events: List[Event]):
+        """
+        Apply events to the display.
+        """
+
+        for event in events:
+            self._update(event)
+
+    def _update(self, event: Event):
+        task_id = event.task_id
+        total = event.total
+        description = event.description
+
+        entry = self.rich_tasks.get(task_id)
+        if entry is None:
+            rich_task_id = self.progress.add_task(
+                description or "", total=total, completed=event.progress
             )
+            self.rich_tasks[task_id] = (rich_task_id, total, description)
+        else:
+            rich_task_id, last_total, last_description = entry
+
+            # Only pass changed fields
+            kwargs = {}
+            if total != last_total:
+                kwargs["total"] = total
+            if description != last_description:
+                kwargs["description"] = description
+            if kwargs:
+                self.rich_tasks[task_id] = (rich_task_id, total, description)
 
-        self.progress.update(
-            rich_task_id,
-            total=event.total,
-            completed=event.progress,
-            description=event.description,
-        )
+            self.progress.update(rich_task_id, completed=event.progress, **kwargs)
 
         if event.finished:
             # self.progress.remove_task(rich_task_id)
-            del self.rich_task_ids[event.task_id]
+            del self.rich_tasks[task_id]
+
+    def handle_event(self, event):
+        self._buffer.add(event)
+
+        # Apply finished events immediately
+        if event.finished:
+            self._buffer.flush()
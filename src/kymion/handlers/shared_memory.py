@@ -0,0 +1,246 @@
+import multiprocessing
+import os
+import queue
+import struct
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional
+
+from ..core import Event
+
+# Layout of the fixed part of a slot: task_id, time, progress, total,
+# name length, description length, flags (followed by name and description)
+_SLOT_HEADER = "=QdddHHB"
+
+_FLAG_FINISHED = 1
+_FLAG_TOTAL_NONE = 2
+_FLAG_STOP = 4
+_FLAG_DESCRIPTION_NONE = 8
+
+
+def _make_slot(max_string_length: int) -> struct.Struct:
+    return struct.Struct(f"{_SLOT_HEADER}{max_string_length}s{max_string_length}s")
+
+
+class SharedMemoryQueue:
+    """
+    A queue for event batches that is backed by a ring buffer in shared memory.
+
+    Instead of pickling events, their fields are packed into fixed-size slots of the ring.
+    Names and descriptions are stored (UTF-8-encoded) in the slot itself, so that
+    every slot is self-contained: A producer that dies after `put` returned
+    cannot leave the consumer waiting for data.
+
+    The queue supports multiple producers and a single consumer. It can be used with
+    `QueueHandler` and `QueueListener` in place of a `multiprocessing.Queue`.
+    Like other multiprocessing primitives, it can only be shared with child processes
+    through inheritance (e.g. as `initargs` of a `ProcessPoolExecutor`).
+
+    Args:
+        capacity (int, optional): The number of events the ring can hold.
+            Producers block while the ring is full. Defaults to 4096.
+        max_string_length (int, optional): The number of bytes reserved for the name and
+            the description in each slot. Longer descriptions are truncated, longer names
+            are rejected (as they are needed to route the events). Defaults to 128.
+        ctx (optional): The multiprocessing context used to create the synchronization
+            primitives. Defaults to the default context.
+    """
+
+    def __init__(
+        self, capacity: int = 4096, max_string_length: int = 128, ctx=None
+    ) -> None:
+        if ctx is None:
+            ctx = multiprocessing.get_context()
+
+        self.capacity = capacity
+        self.max_string_length = max_string_length
+
+        self._slot = _make_slot(max_string_length)
+
+        self._shm = SharedMemory(create=True, size=capacity * self._slot.size)
+        self._creator_pid = os.getpid()
+
+        # Serializes producers
+        self._lock = ctx.Lock()
+        # Index of the next slot to write
+        self._tail = ctx.RawValue("Q", 0)
+        # Number of written and free slots
+        self._items = ctx.Semaphore(0)
+        self._free = ctx.Semaphore(capacity)
+
+        self._init_local_state()
+
+    def _init_local_state(self):
+        # Consumer: Index of the next slot to read
+        self._head = 0
+        # Whether a stop slot was read but not yet reported
+        self._stop_pending = False
+
+    def __getstate__(self):
+        # (Struct objects cannot be pickled.)
+        state = self.__dict__.copy()
+        for key in ("_slot", "_head", "_stop_pending"):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._slot = _make_slot(self.max_string_length)
+        self._init_local_state()
+
+    def close(self):
+        """
+        Release the shared memory. In the creating process, the shared memory is also removed.
+        """
+
+        self._shm.close()
+
+        if os.getpid() == self._creator_pid:
+            self._shm.unlink()
+
+    def _write(self, slots: List[tuple], block: bool, timeout: Optional[float]):
+        """
+        Write slots to the ring.
+
+        Producers reserve as many free slots as are available at once (blocking only while
+        none is available) and write them while holding the lock only once.
+        """
+
+        capacity = self.capacity
+        slot = self._slot
+        buf = self._shm.buf
+
+        i = 0
+        while i < len(slots):
+            if not self._free.acquire(block, timeout):
+                raise queue.Full
+            n = 1
+            while i + n < len(slots) and self._free.acquire(False):
+                n += 1
+
+            with self._lock:
+                tail = self._tail.value
+                for values in slots[i : i + n]:
+                    slot.pack_into(buf, (tail % capacity) * slot.size, *values)
+                    tail += 1
+                self._tail.value = tail
+
+            for _ in range(n):
+                self._items.release()
+
+            i += n
+
+    def put(
+        self,
+        obj: Optional[List[Event]],
+        block: bool = True,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Put a batch of events (or `None` to signal the consumer to stop) into the queue.
+        """
+
+        if obj is None:
+            self._write(
+                [(0, 0.0, 0.0, 0.0, 0, 0, _FLAG_STOP, b"", b"")], block, timeout
+            )
+            return
+
+        max_string_length = self.max_string_length
+
+        slots = []
+        for event in obj:
+            flags = _FLAG_FINISHED if event.finished else 0
+            if event.total is None:
+                flags |= _FLAG_TOTAL_NONE
+
+            name = event.name.encode()
+            if len(name) > max_string_length:
+                raise ValueError(
+                    f"Name {event.name!r} is longer than {max_string_length} bytes"
+                )
+
+            if event.description is None:
+                flags |= _FLAG_DESCRIPTION_NONE
+                description = b""
+            else:
+                description = event.description.encode()
+
+            slots.append(
+                (
+                    event.task_id,
+                    event.time,
+                    event.progress,
+                    event.total or 0.0,
+                    len(name),
+                    min(len(description), max_string_length),
+                    flags,
+                    name,
+                    description,
+                )
+            )
+
+        self._write(slots, block, timeout)
+
+    def _read(self) -> Optional[Event]:
+        slot = self._slot
+        (
+            task_id,
+            t,
+            progress,
+            total,
+            name_length,
+            description_length,
+            flags,
+            name,
+            description,
+        ) = slot.unpack_from(self._shm.buf, (self._head % self.capacity) * slot.size)
+        self._head += 1
+        self._free.release()
+
+        if flags & _FLAG_STOP:
+            return None
+
+        # (Truncation may have split a multi-byte character.)
+        return Event(
+            name[:name_length].decode(errors="ignore"),
+            task_id,
+            t,
+            progress,
+            None if flags & _FLAG_TOTAL_NONE else total,
+            (
+                None
+                if flags & _FLAG_DESCRIPTION_NONE
+                else description[:description_length].decode(errors="ignore")
+            ),
+            bool(flags & _FLAG_FINISHED),
+        )
+
+    def get(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> Optional[List[Event]]:
+        """
+        Remove and return all available events (or `None` if the consumer should stop).
+        """
+
+        if self._stop_pending:
+            self._stop_pending = False
+            return None
+
+        if not self._items.acquire(block, timeout):
+            raise queue.Empty
+
+        events: List[Event] = []
+        while True:
+            event = self._read()
+            if event is None:
+                if not events:
+                    return None
+
+                # Report the events first, then stop
+                self._stop_pending = True
+                return events
+
+            events.append(event)
+
+            if not self._items.acquire(False):
+                return events
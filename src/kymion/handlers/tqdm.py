@@ -1,27 +1,160 @@
-from typing import Dict
-import tqdm.auto
-import tqdm
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-from ..core import ProgressHandler
+from ..core import Event, EventBuffer, ProgressHandler
+
+if TYPE_CHECKING:
+    import tqdm
 
 
 class TQDMHandler(ProgressHandler):
-    def __init__(self) -> None:
+    """
+    A ProgressHandler that displays progress bars using tqdm.
+
+    Bars of tasks that never finish (e.g. because a worker process crashed) are closed
+    once more than `max_bars` bars are open or when they did not receive events for `ttl` seconds.
+
+    Args:
+        min_interval (float, optional): The minimum interval (in seconds) between two
+            refreshes of a progress bar. Events in between only update the state of the bar,
+            which is displayed by a deferred refresh after `min_interval` seconds.
+            Events of finished tasks are always displayed. Defaults to 0.1.
+        max_bars (int, optional): The maximum number of open bars. If exceeded, the bar
+            that did not receive events for the longest time is closed. Defaults to 256.
+        ttl (float, optional): The time (in seconds) after which bars that did not
+            receive events are closed. Defaults to 300.
+    """
+
+    def __init__(
+        self, min_interval: float = 0.1, max_bars: int = 256, ttl: float = 300
+    ) -> None:
         super().__init__()
 
-        self.instances: Dict[int, tqdm.tqdm] = {}
+        # Import lazily, as tqdm.auto is expensive to import
+        import tqdm.auto
+
+        self._tqdm_cls = tqdm.auto.tqdm
+
+        self.min_interval = min_interval
+        self.max_bars = max_bars
+        self.ttl = ttl
+
+        # Open bars, least recently updated first (keyed by task id)
+        self.instances: "OrderedDict[int, tqdm.tqdm]" = OrderedDict()
+
+        # Timestamp of the last event of each task (keyed by task id)
+        self._last_seen: Dict[int, float] = {}
+
+        # Timestamp of the last refresh of each task (keyed by task id)
+        self._last_refresh: Dict[int, float] = {}
+
+        # Last written progress, total and description of each task (keyed by task id)
+        self._last: Dict[int, Tuple[float, Optional[float], Optional[str]]] = {}
+
+        # Lock for synchronizing the bars
+        self._lock = threading.Lock()
+
+        # Buffer of events whose state was not yet displayed
+        # (They are displayed by a deferred refresh from a separate thread.)
+        self._deferred = EventBuffer(self._refresh_deferred, interval=min_interval)
+
+    def close(self):
+        """
+        Stop the deferred refreshes and close all bars.
+        """
+
+        self._deferred.close()
+
+        with self._lock:
+            while self.instances:
+                self._close(next(iter(self.instances)))
+
+    def _refresh_deferred(self, events: List[Event]):
+        with self._lock:
+            now = time.monotonic()
+            for event in events:
+                instance = self.instances.get(event.task_id)
+                if instance is not None:
+                    instance.refresh()
+                    self._last_refresh[event.task_id] = now
+
+    def _close(self, task_id: int):
+        self.instances.pop(task_id).close()
+        del self._last_seen[task_id]
+        del self._last_refresh[task_id]
+        del self._last[task_id]
+        self._deferred.discard(task_id)
 
     def handle_event(self, event):
-        try:
-            instance = self.instances[event.task_id]
-        except KeyError:
-            instance = self.instances[event.task_id] = tqdm.auto.tqdm()
+        with self._lock:
+            refreshed = self._handle_event(event)
+
+        # (Outside of the lock, as the deferred refresh acquires it.)
+        if not refreshed:
+            self._deferred.add(event)
+
+    def _handle_event(self, event) -> bool:
+        """
+        Update the bar of the task and return whether it was refreshed.
+        """
 
-        instance.n = event.progress
-        instance.total = event.total
-        instance.desc = event.description
-        instance.refresh()
+        instances = self.instances
+        now = time.monotonic()
+
+        # Close stale bars
+        while instances:
+            task_id = next(iter(instances))
+            if now - self._last_seen[task_id] <= self.ttl:
+                break
+            self._close(task_id)
+
+        instance = instances.get(event.task_id)
+        if instance is None:
+            # Close the least recently updated bars
+            while instances and len(instances) >= self.max_bars:
+                self._close(next(iter(instances)))
+
+            instance = instances[event.task_id] = self._tqdm_cls()
+        else:
+            instances.move_to_end(event.task_id)
+        self._last_seen[event.task_id] = now
+
+        # Only write changed values
+        progress, total, description = state = (
+            event.progress,
+            event.total,
+            event.description,
+        )
+        last = self._last.get(event.task_id)
+        if last is None:
+            instance.n = progress
+            instance.total = total
+            instance.desc = description
+        elif state != last:
+            last_progress, last_total, last_description = last
+            if progress != last_progress:
+                instance.n = progress
+            if total != last_total:
+                instance.total = total
+            if description != last_description:
+                instance.desc = description
+        self._last[event.task_id] = state
+
+        if (
+            event.finished
+            or now - self._last_refresh.get(event.task_id, float("-inf"))
+            >= self.min_interval
+        ):
+            instance.refresh()
+            self._last_refresh[event.task_id] = now
+            self._deferred.discard(event.task_id)
+            refreshed = True
+        else:
+            refreshed = False
 
         if event.finished:
-            instance.close()
-            del self.instances[event.task_id]
+            self._close(event.task_id)
+
+        return refreshed
@@ -1,9 +1,15 @@
+import os
 import threading
 import time
+import weakref
 from unittest.mock import ANY, Mock
 
+import pytest
+
+import kymion.core
 from kymion.core import (
     Event,
+    EventBuffer,
     NonBlockingRelay,
     ProgressHandler,
     get_progress_reporter,
@@ -39,6 +45,108 @@ def test_task():
     handler.handle_event.assert_called_with(Event(ANY, t2.id, ANY, 10, 10, None, True))
 
 
+def test_task_ids():
+    progress_reporter = get_progress_reporter("test_task_ids")
+
+    t1 = progress_reporter.task()
+    t2 = progress_reporter.task()
+
+    assert t1.id != t2.id
+
+    # Task ids encode the process id
+    assert t1.id >> 32 == t2.id >> 32 == os.getpid()
+
+
+def test_handler_chain():
+    progress_reporter = get_progress_reporter("test_handler_chain")
+
+    handler = Mock(wraps=ProgressHandler())
+    progress_reporter.add_handler(handler)
+
+    t1 = progress_reporter.task()
+    handler.handle_event.assert_called_once()
+
+    # Handlers added to a parent after the first event are picked up
+    root_handler = Mock(wraps=ProgressHandler())
+    progress_reporter.parent.add_handler(root_handler)
+
+    t1.finish()
+    handler.handle_event.assert_called_with(Event(ANY, t1.id, ANY, 0, None, None, True))
+    root_handler.handle_event.assert_called_with(
+        Event(ANY, t1.id, ANY, 0, None, None, True)
+    )
+
+
+def test_handler_chain_thread_safety():
+    class SlowHandlerList(list):
+        def __iter__(self):
+            # Widen the window in which concurrent callers find a chain being rebuilt
+            time.sleep(0.01)
+            return super().__iter__()
+
+    class RecordingHandler(ProgressHandler):
+        def __init__(self) -> None:
+            self.events = []
+
+        def handle_event(self, event):
+            self.events.append(event)
+
+    progress_reporter = kymion.core.ProgressReporter("test_handler_chain_race", None)
+    progress_reporter.handlers = SlowHandlerList()
+
+    handler = RecordingHandler()
+    progress_reporter.add_handler(handler)
+
+    n_threads = 8
+    barrier = threading.Barrier(n_threads)
+
+    def worker():
+        barrier.wait()
+        progress_reporter.task()
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # No thread picked up the chain before it was rebuilt
+    assert len(handler.events) == n_threads
+
+
+def test_no_handlers(monkeypatch):
+    progress_reporter = kymion.core.ProgressReporter("test_no_handlers", None)
+
+    handle_event = Mock(wraps=progress_reporter.handle_event)
+    monkeypatch.setattr(kymion.core.ProgressReporter, "handle_event", handle_event)
+
+    # No events are created if nobody is listening
+    with progress_reporter.task(range(10)) as t:
+        for _ in t:
+            pass
+    handle_event.assert_not_called()
+
+    handler = Mock(wraps=ProgressHandler())
+    progress_reporter.add_handler(handler)
+
+    progress_reporter.task().finish()
+    assert handle_event.call_count == 2
+
+
+def test_map_progress():
+    handler = Mock(wraps=ProgressHandler())
+    progress_reporter = get_progress_reporter("test_map_progress")
+    progress_reporter.add_handler(handler)
+
+    assert list(progress_reporter.map_progress(str, range(10))) == [
+        str(i) for i in range(10)
+    ]
+
+    # Handler got an initialization and "finished" event
+    handler.handle_event.assert_any_call(Event(ANY, ANY, ANY, 0, 10, None, False))
+    handler.handle_event.assert_called_with(Event(ANY, ANY, ANY, 10, 10, None, True))
+
+
 def test_rate_limiting():
     handler = Mock(wraps=ProgressHandler())
     progress_reporter = get_progress_reporter("rate_limited_reporter")
@@ -60,10 +168,158 @@ def test_rate_limiting():
     handler.handle_event.assert_called_with(Event(ANY, t.id, ANY, 10, 10, None, True))
 
 
-def test_thread_safety():
+def test_tick_budget():
+    handler = Mock(wraps=ProgressHandler())
+    progress_reporter = get_progress_reporter("tick_budget_reporter")
+    progress_reporter.add_handler(handler)
+
+    t = progress_reporter.task(total=10000, min_diff_t=60)
+
+    for _ in range(10000):
+        t.update()
+
+    # The clock is read less often in tight loops
+    assert t._tick_budget > 1
+
+    # Only the initialization event was reported
+    assert handler.handle_event.call_count == 1
+
+    t.finish()
+    handler.handle_event.assert_called_with(
+        Event(ANY, t.id, ANY, 10000, 10000, None, True)
+    )
+
+
+def test_iter_throttled(fake_clock):
+    handler = Mock(wraps=ProgressHandler())
+    progress_reporter = get_progress_reporter("iter_throttled_reporter")
+    progress_reporter.add_handler(handler)
+
+    # Iterating with min_diff_n == 0 uses the inlined update logic
+    for _ in progress_reporter.task(range(100), min_diff_t=0.1):
+        fake_clock.t += 0.03
+
+    events = [event for (event,), _ in handler.handle_event.call_args_list]
+
+    # Intermediate progress was reported, at most every min_diff_t seconds
+    intermediate = [event for event in events if 0 < event.progress < 100]
+    assert len(intermediate) >= 10
+    assert [event.progress for event in intermediate] == sorted(
+        event.progress for event in intermediate
+    )
+
+    times = [event.time for event in events[:-1]]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert min(gaps) >= 0.1 - 1e-9
+    assert max(gaps) <= 0.25
+
+    assert events[-1] == Event(ANY, ANY, ANY, 100, 100, None, True)
+
+
+@pytest.mark.parametrize("iterate", [False, True])
+def test_tick_budget_slowdown(fake_clock, iterate):
+    handler = Mock(wraps=ProgressHandler())
+    progress_reporter = get_progress_reporter("tick_budget_slowdown_reporter")
+    progress_reporter.add_handler(handler)
+
+    # A fast phase (1us per update) followed by a slow phase (0.5s per update)
+    t_slow = 0.02
+    durations = [1e-6] * 20000 + [0.5] * 2000
+
+    t = progress_reporter.task(durations, min_diff_t=0.1)
+    if iterate:
+        for duration in t:
+            fake_clock.t += duration
+    else:
+        for duration in durations:
+            fake_clock.t += duration
+            t.update()
+        t.finish()
+
+    # Once the slowdown was noticed, every update is reported again
+    assert t._tick_budget == 1
+
+    times = [
+        event.time
+        for (event,), _ in handler.handle_event.call_args_list
+        if event.time > t_slow
+    ]
+    assert len(times) > 1
+    assert max(b - a for a, b in zip(times, times[1:])) <= 0.5 + 1e-6
+
+
+def test_NonBlockingRelay_close():
+    handler = Mock(wraps=ProgressHandler())
+    relay = NonBlockingRelay()
+    relay.add_handler(handler)
+
+    # The remaining events are forwarded when closing
+    relay.handle_event(Event("test", 1, 0, 1, 5, None, False))
+    relay.close()
+    assert not relay._buffer._thread.is_alive()
+    handler.handle_event.assert_called_once_with(Event("test", 1, 0, 1, 5, None, False))
+
+    # Events after closing are forwarded immediately
+    relay.handle_event(Event("test", 1, 0, 2, 5, None, False))
+    handler.handle_event.assert_called_with(Event("test", 1, 0, 2, 5, None, False))
+
+    # The exit callback was dropped
+    assert all(ref() != relay._buffer.close for ref in kymion.core._exit_callbacks)
+
+
+def test_EventBuffer_owner_collected():
+    class Owner:
+        def flush(self, events):
+            pass
+
+    owner = Owner()
+    buffer = EventBuffer(owner.flush)
+    owner_ref = weakref.ref(owner)
+
+    # The buffer does not keep its owner alive
+    del owner
+    assert owner_ref() is None
+
+    # ... and stops its thread once the owner is gone
+    buffer._thread.join(5)
+    assert not buffer._thread.is_alive()
+
+
+class FakeClock:
+    """
+    A virtual clock that only advances when `sleep` is called.
+    """
+
+    def __init__(self) -> None:
+        self.t = 0.0
+        self._lock = threading.Lock()
+
+    def monotonic(self) -> float:
+        return self.t
+
+    def sleep(self, seconds: float):
+        with self._lock:
+            self.t += seconds
+
+        # Still give other threads a chance to run
+        threading.Event().wait(0)
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "sleep", clock.sleep)
+    monkeypatch.setattr(time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_thread_safety(fake_clock):
+    # Block the handler until all workers are done to force the relay to coalesce events
+    release = threading.Event()
+
     class VerySlowHandler(ProgressHandler):
         def handle_event(self, event):
-            time.sleep(1)
+            release.wait()
 
     very_slow_handler = Mock(wraps=VerySlowHandler())
     relay = Mock(wraps=NonBlockingRelay())
@@ -78,13 +334,23 @@ def test_thread_safety():
 
     threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
 
-    for thread in threads:
-        thread.start()
+    try:
+        for thread in threads:
+            thread.start()
 
-    # Ensure all threads updated correctly, and start and finish is reported
-    for i, thread in enumerate(threads):
-        thread.join()
-        relay.handle_event.assert_any_call(Event(ANY, ANY, ANY, 0, 5, str(i), False))
-        relay.handle_event.assert_any_call(Event(ANY, ANY, ANY, 5, 5, str(i), True))
+        for thread in threads:
+            thread.join()
+
+        # Ensure all threads updated correctly, and start and finish is reported
+        observed = {
+            (event.description, event.progress, event.total, event.finished)
+            for (event,), _ in relay.handle_event.call_args_list
+        }
+        for i in range(len(threads)):
+            assert (str(i), 0, 5, False) in observed
+            assert (str(i), 5, 5, True) in observed
 
-    assert very_slow_handler.handle_event.call_count < relay.handle_event.call_count
+        assert very_slow_handler.handle_event.call_count < relay.handle_event.call_count
+    finally:
+        # Unblock the relay even if an assertion failed
+        release.set()
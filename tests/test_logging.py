@@ -1,11 +1,37 @@
 import logging
-import time
-from kymion.handlers.logging import LoggingHandler
+
+import pytest
+
+from kymion.handlers.logging import LoggingHandler, format_number
 from kymion.core import get_progress_reporter
 
 
+@pytest.mark.parametrize(
+    "x,format,expected",
+    [
+        (0, "si", "0.00"),
+        (1, "si", "1.00"),
+        (1500, "si", "1.50k"),
+        (-1500, "si", "-1.50k"),
+        (999.999, "si", "1.00k"),
+        (2.5e9, "si", "2.50G"),
+        (0.5, "si", "500.00m"),
+        (1000, "iec", "1000.00"),
+        (2048, "iec", "2.00Ki"),
+        (2.5e9, "iec", "2.33Gi"),
+        (1500, None, "1500.00"),
+    ],
+)
+def test_format_number(x, format, expected):
+    assert format_number(x, format) == expected
+
+
 def test_logging():
-    progress_handler = LoggingHandler(log_interval=0.1)
+    # Use a virtual clock to avoid sleeping
+    class Clock:
+        t = 0.0
+
+    progress_handler = LoggingHandler(log_interval=0.1, clock=lambda: Clock.t)
     progress_reporter = get_progress_reporter("test_logging")
     progress_reporter.add_handler(progress_handler)
 
@@ -25,9 +51,15 @@ def test_logging():
     logging_handler.setLevel(logging.INFO)
     logger.addHandler(logging_handler)
 
-    for _ in progress_reporter.task(range(10)):
-        time.sleep(0.1)
+    for _ in progress_reporter.task(range(10), min_diff_t=0):
+        Clock.t += 0.25
 
     print(logging_handler.messages)
 
     # Ensure that the handler logged the expected messages
+    assert len(logging_handler.messages) == 11
+    assert logging_handler.messages[0] == "0.00 / 10.00, 0.00%, 00:00 + ??:??, 0.00it/s"
+    assert (
+        logging_handler.messages[-1]
+        == "10.00 / 10.00, 100.00%, 00:02 + 00:00, 4.00it/s"
+    )
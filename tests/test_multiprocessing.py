@@ -1,9 +1,17 @@
 import multiprocessing
+import os
+import queue
+import threading
 import time
-from unittest.mock import ANY, Mock
+from unittest.mock import Mock
 
+import pytest
+
+from kymion import core
 from kymion.core import Event, NonBlockingRelay, ProgressHandler, get_progress_reporter
+from kymion.handlers.pipe import PipeQueue
 from kymion.handlers.queue import QueueHandler, QueueListener
+from kymion.handlers.shared_memory import SharedMemoryQueue
 
 
 def task(task_id):
@@ -14,54 +22,343 @@ def task(task_id):
     return task_id
 
 
-def _executor_initializer(event_queue):
+def _install_fake_clock(clock):
+    """
+    Replace `time.sleep` and `time.monotonic` by a virtual clock that only advances when
+    `sleep` is called.
+
+    Args:
+        clock (multiprocessing.Value): The current virtual time (shared between processes).
+    """
+
+    def sleep(seconds):
+        with clock.get_lock():
+            clock.value += seconds
+
+    time.sleep = sleep
+    time.monotonic = lambda: clock.value
+
+
+def _executor_initializer(event_queue, clock):
     """
     Initialize a child process with a progress handler that forwards progress events to the main thread.
     """
 
+    _install_fake_clock(clock)
+
     handler = NonBlockingRelay()
     handler.add_handler(QueueHandler(event_queue))
 
     get_progress_reporter().add_handler(handler)
 
 
-def test_ProcessPoolExecutor():
+@pytest.mark.parametrize("queue_factory", ["Queue", SharedMemoryQueue, PipeQueue])
+def test_ProcessPoolExecutor(queue_factory):
     """
     Test the ProcessPoolExecutor wrapper to verify proper forwarding of progress events
     from child processes to the main thread.
     """
 
-    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
     n_tasks = 10
 
     # Set up a multiprocessing context for the test
     # (We need "spawn", because we mix threads and processes.)
     mp_context = multiprocessing.get_context("spawn")
-    event_queue = mp_context.Queue()  # type: ignore
+    if queue_factory == "Queue":
+        event_queue = mp_context.Queue()  # type: ignore
+    else:
+        event_queue = queue_factory(ctx=mp_context)
 
     # Create a mocked progress handler to capture events
     handler = Mock(wraps=ProgressHandler())
     progress_reporter = get_progress_reporter()
     progress_reporter.add_handler(handler)
 
+    # (The listener is shut down last, so that it receives all events sent by the workers.)
     with (
+        QueueListener(event_queue),
         ProcessPoolExecutor(
             # Use the prepared multiprocessing context
             mp_context=mp_context,
             initializer=_executor_initializer,
-            initargs=(event_queue,),
+            initargs=(event_queue, mp_context.Value("d", 0.0)),
         ) as executor,
-        QueueListener(event_queue),
     ):
         # Submit a series of tasks to the executor
-        futures = [executor.submit(task, i) for i in range(n_tasks)]
+        pending = {executor.submit(task, i) for i in range(n_tasks)}
+
+        # Wait for all tasks to complete and collect their IDs (in batches of completed tasks)
+        task_ids = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            task_ids.extend(fut.result() for fut in done)
 
-        # Wait for all tasks to complete and collect their IDs
-        task_ids = [fut.result() for fut in as_completed(futures)]
+    event_queue.close()
 
     # After everything had a chance to run, check for completion
-    for task_id in task_ids:
-        handler.handle_event.assert_any_call(
-            Event(ANY, ANY, ANY, 5, 5, str(task_id), True)
-        )
+    observed = {
+        (event.description, event.progress, event.finished)
+        for (event,), _ in handler.handle_event.call_args_list
+    }
+    assert all((str(task_id), 5, True) in observed for task_id in task_ids)
+
+
+def test_QueueHandler_batching():
+    event_queue = queue.Queue()
+    handler = QueueHandler(event_queue, flush_interval=60)
+
+    handler.handle_event(Event("test", 1, 0, 1, 5, None, False))
+    handler.handle_event(Event("test", 1, 0, 2, 5, None, False))
+    handler.handle_event(Event("test", 2, 0, 1, 5, None, False))
+
+    # Nothing was sent before the flush interval passed
+    assert event_queue.empty()
+
+    # Finished events are sent immediately, together with the most recent events of other tasks
+    handler.handle_event(Event("test", 1, 0, 5, 5, None, True))
+    assert event_queue.get_nowait() == [
+        Event("test", 1, 0, 5, 5, None, True),
+        Event("test", 2, 0, 1, 5, None, False),
+    ]
+
+    handler.close()
+
+
+def test_QueueHandler_flush_thread():
+    event_queue = queue.Queue()
+    handler = QueueHandler(event_queue, flush_interval=0.01)
+
+    # Pending events are sent by the flush thread without further events
+    handler.handle_event(Event("test", 1, 0, 1, 5, None, False))
+    assert event_queue.get(timeout=5) == [Event("test", 1, 0, 1, 5, None, False)]
+
+    handler.close()
+
+    handler = QueueHandler(event_queue, flush_interval=60, batch_size=2)
+
+    # A full batch is sent before the flush interval passed
+    handler.handle_event(Event("test", 1, 0, 1, 5, None, False))
+    handler.handle_event(Event("test", 2, 0, 1, 5, None, False))
+    assert event_queue.get(timeout=5) == [
+        Event("test", 1, 0, 1, 5, None, False),
+        Event("test", 2, 0, 1, 5, None, False),
+    ]
+
+    handler.close()
+
+
+def test_QueueHandler_close():
+    event_queue = queue.Queue()
+    handler = QueueHandler(event_queue, flush_interval=60)
+
+    handler.handle_event(Event("test", 1, 0, 1, 5, None, False))
+
+    # Pending events are sent when closing
+    handler.close()
+    assert not handler._buffer._thread.is_alive()
+    assert all(ref() != handler._buffer.close for ref in core._exit_callbacks)
+    assert event_queue.get_nowait() == [Event("test", 1, 0, 1, 5, None, False)]
+
+    # Events after closing are sent immediately
+    handler.handle_event(Event("test", 1, 0, 2, 5, None, False))
+    assert event_queue.get_nowait() == [Event("test", 1, 0, 2, 5, None, False)]
+
+
+def _send_unfinished_event(event_queue, relay):
+    """
+    Report an unfinished task and exit before the flush interval passed.
+    """
+
+    handler = QueueHandler(event_queue, flush_interval=60)
+
+    progress_reporter = get_progress_reporter("test_QueueHandler_exit")
+    if relay:
+        relay_handler = NonBlockingRelay()
+        relay_handler.add_handler(handler)
+        progress_reporter.add_handler(relay_handler)
+    else:
+        progress_reporter.add_handler(handler)
+
+    progress_reporter.task(total=5, description="foo")
+
+
+@pytest.mark.parametrize("relay", [False, True])
+def test_QueueHandler_exit(relay):
+    mp_context = multiprocessing.get_context("spawn")
+    event_queue = mp_context.Queue()
+
+    process = mp_context.Process(
+        target=_send_unfinished_event, args=(event_queue, relay)
+    )
+    process.start()
+
+    # Pending events are sent when the process exits
+    (event,) = event_queue.get(timeout=30)
+    assert (event.progress, event.total, event.description) == (0, 5, "foo")
+
+    process.join()
+    event_queue.close()
+
+
+def test_SharedMemoryQueue():
+    event_queue = SharedMemoryQueue(capacity=2)
+
+    try:
+        events = [
+            Event("test", 1, 0.5, 1, 5, "foo", False),
+            Event("test", 2, 0.5, 1, None, None, True),
+        ]
+        event_queue.put(events)
+
+        # The ring is full
+        with pytest.raises(queue.Full):
+            event_queue.put([events[0]], False)
+
+        assert event_queue.get() == events
+
+        with pytest.raises(queue.Empty):
+            event_queue.get(False)
+
+        event_queue.put(events[:1])
+        event_queue.put(None)
+
+        # Events before the stop signal are returned first
+        assert event_queue.get() == events[:1]
+        assert event_queue.get() is None
+    finally:
+        event_queue.close()
+
+
+def test_PipeQueue():
+    event_queue = PipeQueue()
+
+    try:
+        events = [
+            Event("test", 1, 0.5, 1, 5, "foo", False),
+            Event("test", 2, 0.5, 1, None, None, True),
+        ]
+        event_queue.put(events)
+        event_queue.put(None)
+
+        assert event_queue.get() == events
+        assert event_queue.get(timeout=1) is None
+
+        with pytest.raises(queue.Empty):
+            event_queue.get(False)
+
+        with pytest.raises(queue.Empty):
+            event_queue.get(timeout=0.01)
+    finally:
+        event_queue.close()
+
+
+def test_QueueListener_shutdown_busy_queue():
+    event_queue = PipeQueue()
+
+    try:
+        listener = QueueListener(event_queue)
+
+        # Another producer is sending
+        event_queue._lock.acquire()
+        try:
+            shutdown_thread = threading.Thread(target=listener.shutdown)
+            shutdown_thread.start()
+
+            # The shutdown waits for the producer instead of failing
+            shutdown_thread.join(0.05)
+            assert shutdown_thread.is_alive()
+        finally:
+            event_queue._lock.release()
+
+        shutdown_thread.join(5)
+        assert not shutdown_thread.is_alive()
+    finally:
+        event_queue.close()
+
+
+def _put_and_die(event_queue, events):
+    event_queue.put(events)
+    os._exit(1)
+
+
+def test_SharedMemoryQueue_dead_producer():
+    mp_context = multiprocessing.get_context("spawn")
+    event_queue = SharedMemoryQueue(ctx=mp_context)
+
+    try:
+        events = [Event("test", 1, 0.5, 1, 5, "foo", False)]
+
+        process = mp_context.Process(target=_put_and_die, args=(event_queue, events))
+        process.start()
+        process.join()
+
+        # The events are complete, although the producer exited right after sending
+        assert event_queue.get(timeout=5) == events
+    finally:
+        event_queue.close()
+
+
+def test_SharedMemoryQueue_truncation():
+    event_queue = SharedMemoryQueue(capacity=2, max_string_length=4)
+
+    try:
+        event_queue.put([Event("test", 1, 0.5, 1, 5, "foo\u00e4\u00e4", False)])
+
+        # Long descriptions are truncated (without splitting characters)
+        assert event_queue.get() == [Event("test", 1, 0.5, 1, 5, "foo", False)]
+
+        # Long names are rejected, as they are needed to route the events
+        with pytest.raises(ValueError):
+            event_queue.put([Event("test.foo", 1, 0.5, 1, 5, None, False)])
+
+        with pytest.raises(queue.Empty):
+            event_queue.get(False)
+    finally:
+        event_queue.close()
+
+
+def test_SharedMemoryQueue_large_batch():
+    event_queue = SharedMemoryQueue(capacity=4)
+
+    try:
+        events = [Event("test", i, 0.0, i, 100, None, False) for i in range(100)]
+
+        # A batch larger than the ring is written in chunks while the consumer drains it
+        producer = threading.Thread(target=event_queue.put, args=(events,))
+        producer.start()
+
+        received = []
+        while len(received) < len(events):
+            received.extend(event_queue.get(timeout=10))
+
+        producer.join()
+        assert received == events
+    finally:
+        event_queue.close()
+
+
+def test_QueueHandler_msgpack():
+    pytest.importorskip("msgspec")
+
+    event_queue = queue.Queue()
+    handler = QueueHandler(event_queue, msgpack=True)
+
+    # Capture events forwarded by the listener
+    forwarded = Mock(wraps=ProgressHandler())
+    get_progress_reporter("test_QueueHandler_msgpack").add_handler(forwarded)
+
+    event = Event("test_QueueHandler_msgpack", 1, 0.5, 5, 5, "foo", True)
+    handler.handle_event(event)
+
+    # Batches are encoded
+    assert isinstance(event_queue.queue[0], bytes)
+
+    # ... and decoded by the listener
+    with QueueListener(event_queue):
+        pass
+
+    forwarded.handle_event.assert_called_once_with(event)
+
+    handler.close()
@@ -0,0 +1,71 @@
+import time
+from unittest.mock import Mock, call
+
+from kymion.core import Event
+from kymion.handlers.rich import RichHandler
+
+
+def _make_handler(update_interval):
+    handler = RichHandler(update_interval=update_interval)
+
+    # Record the calls instead of displaying the progress
+    handler.progress.stop()
+    handler.progress = Mock()
+    handler.progress.add_task.side_effect = lambda *_, **__: len(handler.rich_tasks)
+
+    return handler
+
+
+def test_coalescing():
+    handler = _make_handler(update_interval=60)
+
+    handler.handle_event(Event("test", 1, 0, 1, 5, "foo", False))
+    handler.handle_event(Event("test", 1, 0, 2, 5, "foo", False))
+
+    # Nothing was applied before the update interval passed
+    handler.progress.add_task.assert_not_called()
+
+    # Finished events are applied immediately, together with the most recent events of other tasks
+    handler.handle_event(Event("test", 2, 0, 5, 5, "bar", True))
+    assert handler.progress.add_task.call_args_list == [
+        call("foo", total=5, completed=2),
+        call("bar", total=5, completed=5),
+    ]
+
+
+def test_update_thread():
+    handler = _make_handler(update_interval=0.01)
+
+    # Pending events are applied without further events
+    handler.handle_event(Event("test", 1, 0, 1, 5, "foo", False))
+
+    deadline = time.monotonic() + 5
+    while not handler.progress.add_task.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    handler.progress.add_task.assert_called_once_with("foo", total=5, completed=1)
+
+
+def test_changed_fields():
+    handler = _make_handler(update_interval=60)
+
+    handler.handle_event(Event("test", 1, 0, 1, 5, "foo", False))
+    handler._buffer.flush()
+    rich_task_id = handler.rich_tasks[1][0]
+
+    # Only the progress changed
+    handler.handle_event(Event("test", 1, 0, 2, 5, "foo", False))
+    handler._buffer.flush()
+    handler.progress.update.assert_called_with(rich_task_id, completed=2)
+
+    # The description changed
+    handler.handle_event(Event("test", 1, 0, 3, 5, "bar", False))
+    handler._buffer.flush()
+    handler.progress.update.assert_called_with(
+        rich_task_id, completed=3, description="bar"
+    )
+
+    # The total changed
+    handler.handle_event(Event("test", 1, 0, 5, 10, "bar", True))
+    handler.progress.update.assert_called_with(rich_task_id, completed=5, total=10)
+    assert 1 not in handler.rich_tasks
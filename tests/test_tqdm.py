@@ -0,0 +1,65 @@
+import time
+from unittest.mock import call, patch
+
+from kymion.core import Event
+from kymion.handlers.tqdm import TQDMHandler
+
+
+def test_refresh_rate_limiting():
+    handler = TQDMHandler(min_interval=60)
+
+    with patch("tqdm.auto.tqdm.refresh") as refresh:
+        for i in range(10):
+            handler.handle_event(Event("test", 1, 0, i, 10, None, False))
+
+        # Only the first event was displayed
+        # (tqdm itself calls refresh with arguments when creating a bar.)
+        assert refresh.call_args_list.count(call()) == 1
+
+        # Finished events are always displayed
+        handler.handle_event(Event("test", 1, 0, 10, 10, None, True))
+        assert refresh.call_args_list.count(call()) == 2
+
+    assert not handler.instances
+
+
+def test_deferred_refresh():
+    handler = TQDMHandler(min_interval=0.05)
+
+    with patch("tqdm.auto.tqdm.refresh") as refresh:
+        for i in range(5):
+            handler.handle_event(Event("test", 1, 0, i, 10, None, False))
+
+        # The last state is eventually displayed, even without further events
+        deadline = time.monotonic() + 5
+        while refresh.call_args_list.count(call()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert refresh.call_args_list.count(call()) == 2
+        assert handler.instances[1].n == 4
+        assert not handler._deferred._pending
+
+    # Closing stops the deferred refreshes and closes all bars
+    handler.close()
+    assert not handler._deferred._thread.is_alive()
+    assert not handler.instances
+
+
+def test_stale_bars():
+    handler = TQDMHandler(max_bars=2, ttl=60)
+
+    with patch("time.monotonic", return_value=0):
+        for task_id in range(3):
+            handler.handle_event(Event("test", task_id, 0, 0, 10, None, False))
+
+    # The least recently updated bar was closed
+    assert list(handler.instances) == [1, 2]
+
+    with patch("time.monotonic", return_value=30):
+        handler.handle_event(Event("test", 1, 30, 1, 10, None, False))
+
+    with patch("time.monotonic", return_value=61):
+        handler.handle_event(Event("test", 3, 61, 0, 10, None, False))
+
+    # Bars without events for more than ttl seconds were closed
+    assert list(handler.instances) == [1, 3]